@@ -10,8 +10,10 @@ import subprocess
 from base64 import b64encode, b64decode
 from typing import Union, Optional, Callable
 
+from parci import config
 from parci.internals.docker import docker_env
 from parci.internals.docker import DockerContainer as docker
+from parci.internals.docker import AsyncDockerContainer as docker_async
 from parci.internals.docker import DockerNetwork as docker_net
 from parci.internals.docker import DockerVolume as docker_vol
 from parci.internals.environment import env
@@ -56,8 +58,9 @@ def sh(command, shell="/bin/sh", check=True):
     """
     Execute a command string in a shell.
     """
-    print("Exec:", " ".join([shlex.quote(x) for x in [shell, "-c", command]]))
-    return subprocess.run([shell, "-c", command], check=check)
+    if config.DEBUG:
+        print("Exec:", shlex.join([shell, "-c", command]))
+    return subprocess.run([shell, "-c", command], check=check, env=env.merged())
 
 
 def cmd(command: Union[str, list, tuple], check=True):
@@ -67,46 +70,79 @@ def cmd(command: Union[str, list, tuple], check=True):
     if isinstance(command, str):
         command = (command,)
 
-    print("Exec:", " ".join([shlex.quote(x) for x in command]))
-    return subprocess.run(command, check=check)
+    if config.DEBUG:
+        print("Exec:", shlex.join(command))
+    return subprocess.run(command, check=check, env=env.merged())
+
+
+# Flags for holding on to a directory just so we can fchdir() back to it.
+_DIR_FLAGS = getattr(os, "O_PATH", os.O_RDONLY) | os.O_DIRECTORY
 
 
 class chdir:
     # pylint: disable=invalid-name
     """
     A class for managing the current working directory in taskfiles.
+
+    The working directory only changes inside a with block, so paths can be
+    built up with / without touching the filesystem.
     """
 
     def __init__(self, path):
-        self._old_path = os.getcwd()
-        os.chdir(path)
-        self._thisdir = os.getcwd()
+        self._target = os.path.abspath(str(path))
+        self._old_fds = []
 
     def __enter__(self):
-        os.chdir(self._thisdir)
+        old_fd = os.open(".", _DIR_FLAGS)
+        try:
+            os.chdir(self._target)
+        except OSError:
+            os.close(old_fd)
+            raise
+        self._old_fds.append(old_fd)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        os.chdir(self._old_path)
+        old_fd = self._old_fds.pop()
+        try:
+            os.fchdir(old_fd)
+        finally:
+            os.close(old_fd)
 
     def __truediv__(self, other: str):
-        return chdir(other)
+        return chdir(os.path.join(self._target, str(other)))
 
     def __str__(self):
-        return os.getcwd()
+        return self._target
 
     def __repr__(self):
-        return f"<chdir {os.getcwd()}>"
+        return f"<chdir {self._target}>"
+
+
+def b64enc(data: bytes) -> str:
+    """
+    Encodes bytes to a base64 string.
+    """
+    return b64encode(data).decode("ascii")
+
+
+def b64dec(data: str) -> bytes:
+    """
+    Decodes a base64 string to bytes.
+    """
+    return b64decode(data)
 
 
 def base64(data: Union[str, bytes]) -> Union[str, bytes]:
     """
     Encodes bytes to a base64 string, or decodes a base64 string to bytes.
+
+    Prefer b64enc() or b64dec() when the direction is known.
     """
-    if isinstance(data, str):
-        return b64decode(data)
     if isinstance(data, bytes):
-        return b64encode(data).decode("ascii")
+        return b64enc(data)
+    if isinstance(data, str):
+        return b64dec(data)
     raise TypeError("Type of data is not str or bytes")
 
 
@@ -132,6 +168,7 @@ gid = os.getegid()
 __all__ = (
     "task",
     "docker",
+    "docker_async",
     "docker_net",
     "docker_vol",
     "docker_env",
@@ -146,4 +183,6 @@ __all__ = (
     "uid",
     "gid",
     "base64",
+    "b64enc",
+    "b64dec",
 )
@@ -3,13 +3,25 @@ Parci Command Line Interface
 """
 
 import argparse
+import importlib
 import json
 import sys
 import traceback
 
 from parci import config
 
-from . import run, param, git_hook, task
+# First characters of JSON documents, including the NaN/Infinity extensions.
+JSON_START_CHARS = frozenset('{["-0123456789tfnNI')
+
+# Subcommand name -> (help text, implementing module). Only the module for the
+# subcommand actually being run is imported.
+COMMANDS = {
+    "run": ("Run parci.taskfile tasks", "parci.cli.run"),
+    "param": ("Modify tasklist parameters", "parci.cli.param"),
+    "git-hook": ("Run the git hook", "parci.cli.git_hook"),
+    "task": ("Task management", "parci.cli.task"),
+    "webhook": ("Run builds from push event webhooks", "parci.cli.webhook"),
+}
 
 
 def config_type(value: str):
@@ -24,10 +36,12 @@ def config_type(value: str):
 
     if not hasattr(config, key):
         raise ValueError("Unknown config key")
-    try:
-        value = json.loads(value)
-    except json.JSONDecodeError:
-        pass
+    # Only values that could be JSON are worth trying to decode as JSON.
+    if value[:1] in JSON_START_CHARS:
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass
 
     setattr(config, key, value)
     return key, value
@@ -46,11 +60,12 @@ def main():
     if args.debug:
         config.DEBUG = True
 
+    command = next((x for x in rest if not x.startswith("-")), None)
     subparser = parser.add_subparsers(required=True, metavar="COMMAND")
-    run.setup(subparser.add_parser("run", help="Run parci.taskfile tasks"))
-    param.setup(subparser.add_parser("param", help="Modify tasklist parameters"))
-    git_hook.setup(subparser.add_parser("git-hook", help="Run the git hook"))
-    task.setup(subparser.add_parser("task", help="Task management"))
+    for name, (help_text, module) in COMMANDS.items():
+        command_parser = subparser.add_parser(name, help=help_text)
+        if name == command:
+            importlib.import_module(module).setup(command_parser)
 
     parser.add_argument("--help", "-h", action="help")
 
@@ -2,99 +2,272 @@
 git-hook subcommand
 """
 
-import io
+import fcntl
+import hashlib
 import os
 import subprocess
 import tempfile
-import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Optional, Set, Tuple
 
 from parci import config
 from parci.internals.storage import SqliteKV
 
+# State DB table holding a digest of each repository's last ls-remote output.
+FINGERPRINT_TABLE = ":fingerprints"
 
-def do_cmd(command) -> io.BytesIO:
+
+def mirror_path(repository) -> str:
     """
-    Simple command runner that captures output.
+    Path of the local partial mirror of a repository.
     """
-    c = subprocess.run(command, capture_output=True, check=True)
-    return io.BytesIO(c.stdout)
+    return os.path.join(
+        config.GIT_HOOK_CACHE_DIR,
+        hashlib.sha256(repository.encode("utf-8")).hexdigest(),
+    )
 
 
-def git_hook(args):
+def update_mirror(repository) -> str:
     """
-    git-hook implementation.
+    Create or refresh the local partial mirror of a repository.
+
+    Only the tip commits and trees of each ref are fetched; blobs are fetched
+    on demand. Returns the path of the mirror's git directory.
     """
-    if args.repository is None:
-        raise ValueError("repository is required")
+    mirror = mirror_path(repository)
+    if not os.path.isdir(mirror):
+        os.makedirs(config.GIT_HOOK_CACHE_DIR, mode=0o700, exist_ok=True)
+        subprocess.run(
+            [
+                "git",
+                "clone",
+                "--quiet",
+                "--bare",
+                "--filter=blob:none",
+                "--depth=1",
+                "--no-single-branch",
+                repository,
+                mirror,
+            ],
+            check=True,
+        )
+    subprocess.run(
+        [
+            "git",
+            f"--git-dir={mirror}",
+            "fetch",
+            "--quiet",
+            "--prune",
+            "--depth=1",
+            "--filter=blob:none",
+            "origin",
+            "+refs/*:refs/*",
+        ],
+        check=True,
+    )
+    return mirror
 
-    db = SqliteKV(db=config.GIT_HOOK_STATE_DB, table=args.repository)
 
-    branch_hashes = set()
-    for line in do_cmd(["git", "ls-remote", args.repository]):
-        line = line.decode("utf-8").strip()
-        bhash, bname = line.split(None, 1)
-        if bname == "HEAD":
-            continue
-        branch_hashes.add((bname, bhash))
+def read_taskfiles(mirror, bnames) -> Dict[str, bytes]:
+    """
+    Read parci.taskfile from each ref in a mirror.
+
+    Refs without a parci.taskfile are left out of the result.
+    """
+    blobs = {}
+    for bname in bnames:
+        c = subprocess.run(
+            [
+                "git",
+                f"--git-dir={mirror}",
+                "rev-parse",
+                "--verify",
+                "--quiet",
+                f"{bname}:parci.taskfile",
+            ],
+            capture_output=True,
+            check=False,
+        )
+        if c.returncode == 0:
+            blobs[bname] = c.stdout.strip().decode("ascii")
+    if not blobs:
+        return {}
+
+    # Pull every missing blob in one round trip rather than lazily one by one.
+    # These are the options git itself uses for on-demand blob fetches.
+    subprocess.run(
+        [
+            "git",
+            f"--git-dir={mirror}",
+            "-c",
+            "fetch.negotiationAlgorithm=noop",
+            "fetch",
+            "--quiet",
+            "--no-tags",
+            "--no-write-fetch-head",
+            "--recurse-submodules=no",
+            "--filter=blob:none",
+            "origin",
+            *set(blobs.values()),
+        ],
+        check=True,
+    )
+
+    c = subprocess.run(
+        ["git", f"--git-dir={mirror}", "cat-file", "--batch"],
+        input="".join(f"{oid}\n" for oid in blobs.values()).encode("ascii"),
+        capture_output=True,
+        check=True,
+    )
+    taskfiles = {}
+    out = c.stdout
+    pos = 0
+    for bname in blobs:
+        eol = out.index(b"\n", pos)
+        _oid, _type, size = out[pos:eol].split()
+        start = eol + 1
+        taskfiles[bname] = out[start : start + int(size)]
+        pos = start + int(size) + 1
+    return taskfiles
 
-    prev_branch_hashes = set(db.items())
 
-    to_consider = branch_hashes - prev_branch_hashes
+def fetch_taskfiles(repository, bnames) -> Dict[str, bytes]:
+    """
+    Refresh the mirror of a repository and read parci.taskfile from refs.
+
+    git-hook and webhook may share a mirror from separate processes, so the
+    mirror is held under a file lock while it is fetched into and read.
+    """
+    os.makedirs(config.GIT_HOOK_CACHE_DIR, mode=0o700, exist_ok=True)
+    with open(mirror_path(repository) + ".lock", "wb") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return read_taskfiles(update_mirror(repository), bnames)
+
+
+def build_ref(repository, bname, taskfile: bytes):
+    """
+    Run a ref's parci.taskfile.
+    """
+    child_env = dict(os.environ, GIT_URL=repository)
+    stripped = bname.removeprefix("refs/heads/")
+    if stripped != bname:
+        child_env["BRANCH_NAME"] = stripped
+    else:
+        stripped = bname.removeprefix("refs/tags/")
+        if stripped != bname:
+            child_env["TAG_NAME"] = stripped
+
+    try:
+        with tempfile.TemporaryDirectory(
+            prefix="parci-" + bname.replace("/", "_") + "-"
+        ) as tmpdir:
+            print(f"Running parci for {bname} in {tmpdir}")
+            # The taskfile goes straight to parci over stdin; nothing is written.
+            # Builds run concurrently, so name it after its ref in the output.
+            subprocess.run(
+                ["parci", "run", "--name", f"{bname}:parci.taskfile", "-"],
+                input=taskfile,
+                check=True,
+                cwd=tmpdir,
+                env=child_env,
+            )
+    except subprocess.CalledProcessError:
+        print(f"Build for {bname} failed")
+
+
+def poll_refs(
+    repository: str, fingerprints: SqliteKV
+) -> Optional[Tuple[Set[Tuple[str, str]], str]]:
+    """
+    List the remote refs of a repository as a set of (name, hash) pairs.
+
+    Returns None when the ls-remote output matches the stored fingerprint;
+    otherwise the refs and the new fingerprint, to be saved once handled.
+    """
+    out = subprocess.run(
+        ["git", "ls-remote", repository], capture_output=True, check=True
+    ).stdout
+
+    # Most polls find nothing new; skip the diff when the output is unchanged.
+    fingerprint = hashlib.blake2b(out, digest_size=16).hexdigest()
+    if fingerprints.get(repository) == fingerprint:
+        return None
+
+    # Annotated tags are listed twice, also peeled as "refs/tags/v1^{}"; build
+    # them once, under their own name.
+    branch_hashes = {
+        (bname.decode("utf-8"), bhash.decode("ascii"))
+        for bhash, bname in (line.split(None, 1) for line in out.splitlines())
+        if bname != b"HEAD" and not bname.endswith(b"^{}")
+    }
+    return branch_hashes, fingerprint
+
+
+def store_refs(db: SqliteKV, branch_hashes: Set[Tuple[str, str]]):
+    """
+    Replace the stored refs with branch_hashes.
+    """
+    prev_branch_hashes = set(db.items())
 
     # Update the database
     cur_names = {x[0] for x in branch_hashes}
     prev_names = {x[0] for x in prev_branch_hashes}
     rm_names = cur_names ^ prev_names
-    for name in rm_names:
-        del db[name]
-    for bname, bhash in branch_hashes:
-        db[bname] = bhash
+    with db.batch():
+        for name in rm_names:
+            del db[name]
+        for bname, bhash in branch_hashes:
+            db[bname] = bhash
+
+
+def git_hook(args):
+    """
+    git-hook implementation.
+    """
+    if args.repository is None:
+        raise ValueError("repository is required")
+
+    db = SqliteKV(db=config.GIT_HOOK_STATE_DB, table=args.repository)
+    fingerprints = db.for_table(FINGERPRINT_TABLE)
+    polled = poll_refs(args.repository, fingerprints)
+    if polled is None:
+        return
+    branch_hashes, fingerprint = polled
 
     # Figure out if we should run parci tasks
-    for bname, bhash in sorted(to_consider):
-        try:
-            zipdata = do_cmd(
-                [
-                    "git",
-                    "archive",
-                    "--format=zip",
-                    "--remote",
-                    args.repository,
-                    bname,
-                    "parci.taskfile",
-                ]
-            )
-        except subprocess.CalledProcessError:
+    to_consider = branch_hashes - set(db.items())
+    bnames = sorted(bname for bname, _bhash in to_consider)
+    # Record the refs only once their taskfiles are read; if reading fails, the
+    # next poll sees the same refs as changed and tries again.
+    taskfiles = fetch_taskfiles(args.repository, bnames) if bnames else {}
+    with db.batch():
+        store_refs(db, branch_hashes)
+        fingerprints[args.repository] = fingerprint
+
+    for bname in bnames:
+        if bname not in taskfiles:
             print(f"Skipping {bname}: No parci.taskfile")
-            continue
-
-        try:
-            # pylint: disable=consider-using-with
-            zarch = zipfile.ZipFile(zipdata, mode="r")
-            with tempfile.TemporaryDirectory(
-                prefix="parci-" + bname.replace("/", "_") + "-"
-            ) as tmpdir:
-                zarch.extract("parci.taskfile", tmpdir)
-                os.chdir(tmpdir)
-                os.makedirs("work")
-                os.chdir("work")
-                print(f"Running parci for {bname} in {tmpdir}")
-                os.environ["GIT_URL"] = args.repository
-                if "refs/heads/" in bname:
-                    os.environ["BRANCH_NAME"] = bname[len("refs/heads/") :]
-                elif "refs/tags/" in bname:
-                    os.environ["TAG_NAME"] = bname[len("refs/tags/") :]
-                subprocess.run(["parci", "run", "../parci.taskfile"], check=True)
-        except subprocess.CalledProcessError:
-            print(f"Build for {bname} failed")
-            continue
-        finally:
-            if "BRANCH_NAME" in os.environ:
-                del os.environ["BRANCH_NAME"]
-            if "TAG_NAME" in os.environ:
-                del os.environ["TAG_NAME"]
-            if "GIT_REPO" in os.environ:
-                del os.environ["GIT_REPO"]
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [
+            executor.submit(build_ref, args.repository, bname, taskfile)
+            for bname, taskfile in taskfiles.items()
+        ]
+        for future in as_completed(futures):
+            future.result()
+
+
+def add_jobs_argument(parser):
+    """
+    Add the --jobs option shared by the git-hook and webhook subcommands.
+    """
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of refs to build concurrently (default: CPU count)",
+    )
 
 
 def setup(parser):
@@ -102,4 +275,5 @@ def setup(parser):
     git-hook CLI setup
     """
     parser.add_argument("repository", nargs="?", default=os.environ.get("GIT_DIR"))
+    add_jobs_argument(parser)
     parser.set_defaults(func=git_hook)
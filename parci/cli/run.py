@@ -2,6 +2,8 @@
 The run subcommand
 """
 
+import collections
+
 import parci
 import parci.internals.task
 from parci.internals.utils import (
@@ -17,7 +19,7 @@ def run_tasks(args):
     """
     parci run entrypoint
     """
-    taskfile = load_taskfile(args.taskfile)
+    taskfile = load_taskfile(args.taskfile, stdin_name=args.name)
 
     if args.start_at is None:
         starting_tasks = get_starting_tasks(taskfile)
@@ -38,15 +40,24 @@ def run_tasks(args):
             remaining_tasks = set()
             find_tasks({starting_task}, remaining_tasks)
 
-            while remaining_tasks:
-                ready = ready_tasks(remaining_tasks)
-                if not ready and remaining_tasks:
-                    raise ValueError(
-                        f"No ready tasks and remaining tasks: {remaining_tasks}"
-                    )
-                for task in ready:
-                    task.run(f"{taskfile.__file__} @ ")  # pylint: disable=no-member
-                    remaining_tasks.remove(task)
+            # Tasks become ready as their last parent succeeds, so only the
+            # children of a task just run need checking.
+            ready = collections.deque(ready_tasks(remaining_tasks))
+            while ready:
+                task = ready.popleft()
+                task.run(f"{taskfile.__file__} @ ")  # pylint: disable=no-member
+                remaining_tasks.discard(task)
+                ready.extend(
+                    child
+                    for child in task.children
+                    if child in remaining_tasks and child.is_ready
+                )
+
+            remaining_tasks = {task for task in remaining_tasks if not task.has_run}
+            if remaining_tasks:
+                raise ValueError(
+                    f"No ready tasks and remaining tasks: {remaining_tasks}"
+                )
             # pylint: disable=no-member
             print(
                 f"Execution of starting taskset completed: {taskfile.__file__} @ {starting_task}"
@@ -59,6 +70,16 @@ def setup(parser):
     """
     parci run subcommand setup
     """
-    parser.add_argument("taskfile", nargs="?", default="parci.taskfile")
+    parser.add_argument(
+        "taskfile",
+        nargs="?",
+        default="parci.taskfile",
+        help="Location of parci taskfile, or - for stdin (default: parci.taskfile)",
+    )
     parser.add_argument("--start-at", help="Task to start execution at")
+    parser.add_argument(
+        "--name",
+        default="<stdin>",
+        help="Name to show for a taskfile read from stdin (default: <stdin>)",
+    )
     parser.set_defaults(func=run_tasks)
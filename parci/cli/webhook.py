@@ -0,0 +1,144 @@
+"""
+webhook subcommand
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from wsgiref.simple_server import make_server
+
+from parci import config
+from parci.internals.storage import SqliteKV
+
+from .git_hook import (
+    FINGERPRINT_TABLE,
+    add_jobs_argument,
+    build_ref,
+    fetch_taskfiles,
+)
+
+NULL_HASH = "0" * 40
+
+
+def verify_signature(secret: str, body: bytes, environ: dict) -> bool:
+    """
+    Verify a GitHub (X-Hub-Signature-256) or GitLab (X-Gitlab-Token) delivery.
+    """
+    signature: Optional[str] = environ.get("HTTP_X_HUB_SIGNATURE_256")
+    if signature is not None:
+        if not signature.startswith("sha256="):
+            return False
+        expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature[len("sha256=") :])
+
+    token: Optional[str] = environ.get("HTTP_X_GITLAB_TOKEN")
+    if token is not None:
+        return hmac.compare_digest(secret.encode("utf-8"), token.encode("utf-8"))
+
+    return False
+
+
+def build_push(repository, bname):
+    """
+    Fetch and run the parci.taskfile of a pushed ref.
+    """
+    taskfiles = fetch_taskfiles(repository, [bname])
+    if bname not in taskfiles:
+        print(f"Skipping {bname}: No parci.taskfile")
+        return
+    build_ref(repository, bname, taskfiles[bname])
+
+
+def _report_build(future):
+    exc = future.exception()
+    if exc is not None:
+        traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+
+def make_app(repository: str, secret: str, executor: ThreadPoolExecutor):
+    """
+    Build the WSGI application which receives push events for a repository.
+    """
+
+    def respond(start_response, status, message):
+        body = message.encode("utf-8")
+        start_response(
+            status,
+            [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))],
+        )
+        return [body]
+
+    def app(environ, start_response):
+        if environ["REQUEST_METHOD"] != "POST":
+            return respond(start_response, "405 Method Not Allowed", "POST only\n")
+
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        body = environ["wsgi.input"].read(length)
+
+        if not verify_signature(secret, body, environ):
+            return respond(start_response, "403 Forbidden", "Bad signature\n")
+
+        try:
+            payload = json.loads(body)
+            bname = payload["ref"]
+            bhash = payload["after"]
+        except (json.JSONDecodeError, TypeError, KeyError):
+            bname = bhash = None
+        if not (isinstance(bname, str) and isinstance(bhash, str)):
+            # Not a push event (e.g. a ping); nothing to do.
+            return respond(start_response, "200 OK", "Ignored\n")
+
+        db = SqliteKV(db=config.GIT_HOOK_STATE_DB, table=repository)
+        with db.batch():
+            # The ref state is changing under git-hook; make its next poll diff again.
+            del db.for_table(FINGERPRINT_TABLE)[repository]
+            if bhash == NULL_HASH:
+                del db[bname]
+                return respond(start_response, "200 OK", "Removed\n")
+
+            if db.get(bname) == bhash:
+                # Redelivery of an event we have already handled.
+                return respond(start_response, "200 OK", "Unchanged\n")
+            db[bname] = bhash
+
+        print(f"Queueing build for {bname} ({bhash})")
+        executor.submit(build_push, repository, bname).add_done_callback(
+            _report_build
+        )
+        return respond(start_response, "200 OK", "Queued\n")
+
+    return app
+
+
+def webhook(args):
+    """
+    webhook implementation.
+    """
+    if args.repository is None:
+        raise ValueError("repository is required")
+    if config.WEBHOOK_SECRET is None:
+        raise ValueError("config.WEBHOOK_SECRET must be set")
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        app = make_app(args.repository, config.WEBHOOK_SECRET, executor)
+        with make_server(args.bind, args.port, app) as httpd:
+            print(f"Listening for push events on {args.bind}:{args.port}")
+            httpd.serve_forever()
+
+
+def setup(parser):
+    """
+    webhook CLI setup
+    """
+    parser.add_argument("repository", nargs="?", default=os.environ.get("GIT_DIR"))
+    parser.add_argument("--bind", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    add_jobs_argument(parser)
+    parser.set_defaults(func=webhook)
@@ -2,20 +2,39 @@
 Parci configuration.
 """
 
+import functools
 import os
-import platform
 
 DEBUG = os.environ.get("PARCI_DEBUG", False)
 PARAMETER_DRIVER = os.environ.get("PARCI_PARAMETER_DRIVER", "local")
 
-# Set the PARAMETER_DB location somewhat sensibly
-if platform.system() == "Darwin":
-    PARAMETER_DB = os.environ.get(
-        "PARCI_PARAMETER_DB",
-        os.path.join(os.path.expanduser("~"), "Library", "Parci", "params.db"),
-    )
-else:
-    PARAMETER_DB = os.environ.get(
+PARAMETER_DB_PASSWORD = os.environ.get("PARCI_PARAMETER_DB_PASSWORD", None)
+
+PARAMETER_READ_ONLY = True
+
+# Argon2id limits for newly created password/YubiKey keys (None: libsodium SENSITIVE)
+PARAMETER_ARGON2_OPSLIMIT = os.environ.get("PARCI_PARAMETER_ARGON2_OPSLIMIT", None)
+PARAMETER_ARGON2_MEMLIMIT = os.environ.get("PARCI_PARAMETER_ARGON2_MEMLIMIT", None)
+
+WEBHOOK_SECRET = os.environ.get("PARCI_WEBHOOK_SECRET", None)
+
+
+# The filesystem locations below are only worked out when first used, via the
+# module __getattr__. Assigning to them (e.g. via --config) still overrides them.
+
+
+@functools.cache
+def _parameter_db():
+    # pylint: disable=import-outside-toplevel
+    import platform
+
+    # Set the PARAMETER_DB location somewhat sensibly
+    if platform.system() == "Darwin":
+        return os.environ.get(
+            "PARCI_PARAMETER_DB",
+            os.path.join(os.path.expanduser("~"), "Library", "Parci", "params.db"),
+        )
+    return os.environ.get(
         "PARCI_PARAMETER_DB",
         os.path.join(
             os.environ.get(
@@ -28,15 +47,33 @@ else:
     )
 
 
-PARAMETER_DB_PASSWORD = os.environ.get("PARCI_PARAMETER_DB_PASSWORD", None)
+@functools.cache
+def _git_hook_state_db():
+    return os.environ.get(
+        "PARCI_GIT_HOOK_STATE_DB",
+        os.path.join(os.path.dirname(_parameter_db()), "git-hook-state.db"),
+    )
 
-PARAMETER_READ_ONLY = True
 
-GIT_HOOK_STATE_DB = os.environ.get(
-    "PARCI_GIT_HOOK_STATE_DB",
-    os.path.join(os.path.dirname(PARAMETER_DB), "git-hook-state.db"),
-)
+@functools.cache
+def _git_hook_cache_dir():
+    return os.environ.get(
+        "PARCI_GIT_HOOK_CACHE_DIR",
+        os.path.join(os.path.dirname(_parameter_db()), "git-hook-cache"),
+    )
+
+
+_LAZY_SETTINGS = {
+    "PARAMETER_DB": _parameter_db,
+    "GIT_HOOK_STATE_DB": _git_hook_state_db,
+    "GIT_HOOK_CACHE_DIR": _git_hook_cache_dir,
+}
+
 
-# Clean the namespace up.
-del os
-del platform
+def __getattr__(name):
+    """
+    Resolve lazily computed settings.
+    """
+    if name in _LAZY_SETTINGS:
+        return _LAZY_SETTINGS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,37 +2,125 @@
 Docker container, network, and volume management for parci.
 """
 
+import asyncio
+import itertools
+import os
 import shlex
 import subprocess
-import tempfile
-import uuid
-
-from base64 import b32encode
+import time
 
+from parci import config
 from parci.constants import workdir as startup_workdir, uid, gid
+from parci.internals import environment
 
 _docker_networks = set()
 _docker_volumes = set()
 _docker_containers = set()
 
+# Process id plus start time keeps ids unique across concurrent and past runs.
+_id_tag = f"{os.getpid():x}-{time.time_ns() // 1_000_000_000:x}"
+_id_counter = itertools.count()
+
 
 def docker_cleanup():
     """
     Clean up all spawned docker containers, networks, and volumes.
+
+    Each kind of object is removed with a single docker command.
     """
-    for container in list(_docker_containers):
-        container.cleanup()
-    for volume in list(_docker_volumes):
-        volume.cleanup()
-    for network in list(_docker_networks):
-        network.cleanup()
+    if _docker_containers:
+        names = [container.container_name for container in _docker_containers]
+        print(f"Cleaning up containers: {' '.join(names)}")
+        subprocess.run(
+            ["docker", "container", "rm", "--force", "--volumes", *names],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+            env=environment.env.merged(),
+        )
+        _docker_containers.clear()
+    if _docker_volumes:
+        names = [volume.volume_name for volume in _docker_volumes]
+        print(f"Cleaning up volumes: {' '.join(names)}")
+        subprocess.run(
+            ["docker", "volume", "remove", *names],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            env=environment.env.merged(),
+        )
+        _docker_volumes.clear()
+    if _docker_networks:
+        names = [network.network_name for network in _docker_networks]
+        print(f"Cleaning up networks: {' '.join(names)}")
+        subprocess.run(
+            ["docker", "network", "remove", *names],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            env=environment.env.merged(),
+        )
+        _docker_networks.clear()
 
 
 def _parci_id(prefix="parci"):
     """
     Generate a unique id for docker objects.
     """
-    return prefix + "-" + b32encode(uuid.uuid4().bytes).decode("ascii").replace("=", "")
+    return f"{prefix}-{_id_tag}-{next(_id_counter):x}"
+
+
+async def _arun(args, check=True, env=None, quiet=False):
+    """
+    asyncio counterpart of subprocess.run for docker commands.
+    """
+    output = subprocess.DEVNULL if quiet else None
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=output, stderr=output, env=env
+    )
+    returncode = await proc.wait()
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, args)
+
+
+def _env_args(env):
+    """
+    Build docker --env arguments from a dict or an env-file formatted string.
+
+    Values are passed as --env NAME=VALUE so they never enter the environment of
+    the docker client itself; bare names are passed through from the taskfile's
+    environment.
+    """
+    if env is None:
+        return []
+
+    if hasattr(env, "items"):
+        entries = [f"{key}={value}" for key, value in env.items()]
+    else:
+        entries = []
+        for line in env.splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                entries.append(line)
+
+    env_args = []
+    for entry in entries:
+        env_args.extend(["--env", entry])
+    return env_args
+
+
+def _shown_args(docker_args):
+    """
+    Quote docker arguments for a debug line, masking the values of --env entries.
+    """
+    shown = []
+    after_env = False
+    for arg in docker_args:
+        if after_env and "=" in arg:
+            arg = arg.split("=", 1)[0] + "=***"
+        after_env = arg == "--env"
+        shown.append(arg)
+    return shlex.join(shown)
 
 
 class DockerNetwork:
@@ -42,7 +130,11 @@ class DockerNetwork:
 
     def __init__(self):
         self.network_name = _parci_id("parci-net")
-        subprocess.run(["docker", "network", "create", self.network_name], check=True)
+        subprocess.run(
+            ["docker", "network", "create", self.network_name],
+            check=True,
+            env=environment.env.merged(),
+        )
         _docker_networks.add(self)
 
     def __enter__(self):
@@ -64,6 +156,7 @@ class DockerNetwork:
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
             check=True,
+            env=environment.env.merged(),
         )
         _docker_networks.remove(self)
 
@@ -75,7 +168,11 @@ class DockerVolume:
 
     def __init__(self):
         self.volume_name = _parci_id("parci-vol")
-        subprocess.run(["docker", "volume", "create", self.volume_name], check=True)
+        subprocess.run(
+            ["docker", "volume", "create", self.volume_name],
+            check=True,
+            env=environment.env.merged(),
+        )
         _docker_volumes.add(self)
 
     def __enter__(self):
@@ -97,10 +194,132 @@ class DockerVolume:
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
             check=True,
+            env=environment.env.merged(),
         )
         _docker_volumes.remove(self)
 
 
+# pylint: disable-next=too-many-arguments,too-many-locals,too-many-branches
+def _run_args(
+    container_name,
+    image_name,
+    *,
+    command=(),
+    entrypoint=None,
+    network=None,
+    name=None,
+    env=None,
+    workdir=None,
+    volumes=None,
+    user=None,
+    privileged=False,
+    detach=False,
+    tty=False,
+    interactive=False,
+):
+    """
+    Build the docker container run arguments for a container.
+    """
+    docker_args = ["docker", "container", "run", f"--name={container_name}"]
+
+    if detach:
+        docker_args.append("--detach")
+
+    if privileged:
+        docker_args.append("--privileged")
+
+    if tty:
+        docker_args.append("--tty")
+
+    if interactive:
+        docker_args.append("--interactive")
+
+    docker_args.extend(_env_args(env))
+
+    if name is not None:
+        docker_args.append(f"--network-alias={name}")
+
+    if entrypoint is not None:
+        docker_args.append(f"--entrypoint={entrypoint}")
+
+    if workdir is not None:
+        docker_args.append(f"--workdir={workdir}")
+
+    if isinstance(volumes, str):
+        docker_args.append("--volume=" + volumes)
+    elif hasattr(volumes, "items"):
+        for key, value in volumes.items():
+            if isinstance(key, DockerVolume):
+                docker_args.append(f"--volume={key.volume_name}:{value}")
+            else:
+                docker_args.append(f"--volume={key}:{value}")
+
+    if network is not None:
+        if isinstance(network, DockerNetwork):
+            docker_args.append(f"--network={network.network_name}")
+        else:
+            docker_args.append(f"--network={network}")
+
+    if user is not None:
+        docker_args.append(f"--user={user}")
+
+    docker_args.append(image_name)
+
+    if isinstance(command, str):
+        docker_args.append(command)
+    elif command:
+        docker_args.extend(list(command))
+
+    return docker_args
+
+
+# pylint: disable-next=too-many-arguments
+def _exec_args(
+    container_name,
+    command,
+    *,
+    detach=False,
+    env=None,
+    privileged=False,
+    interactive=False,
+    tty=False,
+    user=None,
+    workdir=None,
+    shell=False,
+):
+    """
+    Build the docker container exec arguments for a command.
+    """
+    docker_args = ["docker", "container", "exec"]
+
+    if detach:
+        docker_args.append("--detach")
+    if privileged:
+        docker_args.append("--privileged")
+    if interactive:
+        docker_args.append("--interactive")
+    if tty:
+        docker_args.append("--tty")
+    if user is not None:
+        docker_args.append(f"--user={user}")
+    if workdir is not None:
+        docker_args.append(f"--workdir={workdir}")
+
+    docker_args.extend(_env_args(env))
+
+    docker_args.append(container_name)
+    if isinstance(shell, str):
+        docker_args.extend([shell, "-c", command])
+    elif shell is True:
+        docker_args.extend(["/bin/sh", "-c", command])
+    elif isinstance(command, str):
+        docker_args.append(command)
+    else:
+        docker_args.extend(command)
+
+    return docker_args
+
+
 class DockerContainer:
     """
     A convenience class for managing docker containers in parci taskfiles.
@@ -124,70 +343,29 @@ class DockerContainer:
         interactive=False,
     ):
         self.container_name = _parci_id("parci-ctnr")
-        docker_args = ["docker", "container", "run", f"--name={self.container_name}"]
-
-        if detach:
-            docker_args.append("--detach")
-
-        if privileged:
-            docker_args.append("--privileged")
-
-        if tty:
-            docker_args.append("--tty")
-
-        if interactive:
-            docker_args.append("--interactive")
-
-        # pylint: disable=consider-using-with
-        envfile = tempfile.NamedTemporaryFile(mode="w")
-        if hasattr(env, "items"):
-            for key, value in env.items():
-                envfile.write(f"{key}={value}\n")
-        elif env is not None:
-            envfile.write(env)
-        envfile.flush()
-        docker_args.append(f"--env-file={envfile.name}")
-
-        if name is not None:
-            docker_args.append(f"--network-alias={name}")
-
-        if entrypoint is not None:
-            docker_args.append(f"--entrypoint={entrypoint}")
-
-        if workdir is not None:
-            docker_args.append(f"--workdir={workdir}")
-
-        if isinstance(volumes, str):
-            docker_args.append("--volume=" + volumes)
-        elif hasattr(volumes, "items"):
-            for key, value in volumes.items():
-                if isinstance(key, DockerVolume):
-                    docker_args.append(f"--volume={key.volume_name}:{value}")
-                else:
-                    docker_args.append(f"--volume={key}:{value}")
-
-        if network is not None:
-            if isinstance(network, DockerNetwork):
-                docker_args.append(f"--network={network.network_name}")
-            else:
-                docker_args.append(f"--network={network}")
-
-        if user is not None:
-            docker_args.append(f"--user={user}")
-
-        docker_args.append(image_name)
-
-        if isinstance(command, str):
-            docker_args.append(command)
-        elif command:
-            docker_args.extend(list(command))
+        docker_args = _run_args(
+            self.container_name,
+            image_name,
+            command=command,
+            entrypoint=entrypoint,
+            network=network,
+            name=name,
+            env=env,
+            workdir=workdir,
+            volumes=volumes,
+            user=user,
+            privileged=privileged,
+            detach=detach,
+            tty=tty,
+            interactive=interactive,
+        )
 
-        print("Exec:", " ".join([shlex.quote(x) for x in docker_args]))
+        if config.DEBUG:
+            print("Exec:", _shown_args(docker_args))
         try:
-            subprocess.run(docker_args, check=True)
+            subprocess.run(docker_args, check=True, env=environment.env.merged())
         finally:
             _docker_containers.add(self)
-            envfile.close()
 
     def __enter__(self):
         return self
@@ -207,6 +385,7 @@ class DockerContainer:
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
             check=check,
+            env=environment.env.merged(),
         )
 
     def start(self):
@@ -218,6 +397,7 @@ class DockerContainer:
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
             check=True,
+            env=environment.env.merged(),
         )
 
     def wait(self, check=True):
@@ -229,6 +409,7 @@ class DockerContainer:
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
             check=check,
+            env=environment.env.merged(),
         )
 
     def attach(self):
@@ -240,6 +421,7 @@ class DockerContainer:
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
             check=True,
+            env=environment.env.merged(),
         )
 
     def remove(self, check=True):
@@ -251,6 +433,7 @@ class DockerContainer:
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
             check=check,
+            env=environment.env.merged(),
         )
 
     def exec(
@@ -269,59 +452,108 @@ class DockerContainer:
         Execute a command inside this container.
         """
 
-        docker_args = ["docker", "container", "exec"]
-
-        if detach:
-            docker_args.append("--detach")
-        if privileged:
-            docker_args.append("--privileged")
-        if interactive:
-            docker_args.append("--interactive")
-        if tty:
-            docker_args.append("--tty")
-        if user is not None:
-            docker_args.append(f"--user={user}")
-        if workdir is not None:
-            docker_args.append(f"--workdir={workdir}")
-
-        envfile = None
-        if env is not None:
-            # pylint: disable=consider-using-with
-            envfile = tempfile.NamedTemporaryFile(mode="w")
-            if hasattr(envfile, "items"):
-                for key, value in env.items():
-                    envfile.write(f"{key}={value}\n")
-            else:
-                envfile.write(env)
-            envfile.flush()
-            docker_args.append(f"--env-file={envfile.name}")
-
-        docker_args.append(self.container_name)
-        if isinstance(shell, str):
-            docker_args.extend([shell, "-c", command])
-        elif shell is True:
-            docker_args.extend(["/bin/sh", "-c", command])
-        elif isinstance(command, str):
-            docker_args.append(command)
-        else:
-            docker_args.extend(command)
+        docker_args = _exec_args(
+            self.container_name,
+            command,
+            detach=detach,
+            env=env,
+            privileged=privileged,
+            interactive=interactive,
+            tty=tty,
+            user=user,
+            workdir=workdir,
+            shell=shell,
+        )
+        if config.DEBUG:
+            print("Exec:", _shown_args(docker_args))
+        subprocess.run(docker_args, check=True, env=environment.env.merged())
+
+    def cleanup(self):
+        """
+        Clean up after myself.
+        """
+        print(f"Cleaning up container: {self.container_name}")
+        # rm --force stops the container first, saving separate stop/wait calls.
+        subprocess.run(
+            [
+                "docker",
+                "container",
+                "rm",
+                "--force",
+                "--volumes",
+                self.container_name,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+            env=environment.env.merged(),
+        )
+        _docker_containers.remove(self)
+
+
+class AsyncDockerContainer:
+    """
+    An asyncio variant of DockerContainer, for starting several containers
+    concurrently, e.g. with asyncio.gather().
+
+    Takes image_name and command like DockerContainer, with its other options
+    as keyword arguments; the container is started by awaiting run() or
+    entering it with async with.
+    """
 
+    def __init__(self, image_name, command=(), **kwargs):
+        self.container_name = _parci_id("parci-ctnr")
+        self._docker_args = _run_args(self.container_name, image_name, command=command, **kwargs)
+
+    async def __aenter__(self):
+        return await self.run()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if any([exc_type, exc_val, exc_tb]):
+            # Delay cleanup
+            return
+        await self.cleanup()
+
+    async def run(self):
+        """
+        Create and start this container.
+        """
+        if config.DEBUG:
+            print("Exec:", _shown_args(self._docker_args))
         try:
-            print("Exec:", " ".join([shlex.quote(x) for x in docker_args]))
-            subprocess.run(docker_args, check=True)
+            await _arun(self._docker_args, env=environment.env.merged())
         finally:
-            if envfile is not None:
-                envfile.close()
+            _docker_containers.add(self)
+        return self
 
-    def cleanup(self):
+    async def exec(self, command, **kwargs):
+        """
+        Execute a command inside this container.
+        """
+        docker_args = _exec_args(self.container_name, command, **kwargs)
+        if config.DEBUG:
+            print("Exec:", _shown_args(docker_args))
+        await _arun(docker_args, env=environment.env.merged())
+
+    async def cleanup(self):
         """
         Clean up after myself.
         """
         print(f"Cleaning up container: {self.container_name}")
-        self.stop(check=False)
-        self.wait(check=False)
-        self.remove(check=False)
-        _docker_containers.remove(self)
+        await _arun(
+            [
+                "docker",
+                "container",
+                "rm",
+                "--force",
+                "--volumes",
+                self.container_name,
+            ],
+            check=False,
+            env=environment.env.merged(),
+            quiet=True,
+        )
+        _docker_containers.discard(self)
 
 
 def docker_env(image_name, **kwargs):
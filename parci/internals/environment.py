@@ -3,6 +3,7 @@ Parci environment related functions.
 """
 
 import os
+from typing import Dict, Optional
 
 
 class EnvAccessor:
@@ -10,13 +11,18 @@ class EnvAccessor:
     A convenience accessor to environment variables.
 
     Instead of os.environ['SOME_VAR'], we can do env.SOME_VAR in parci taskfiles.
+
+    Variables set through the accessor are kept in an overlay on top of
+    os.environ rather than written to it; use merged() to get the combined
+    environment for a subprocess.
     """
 
-    def __init__(self, **kwargs):
+    def __init__(self, _overlay: Optional[Dict[str, str]] = None, **kwargs):
+        self._overlay = {} if _overlay is None else _overlay
         self._old_envvars = {}
         for key, value in kwargs.items():
-            self._old_envvars[key] = os.environ.get(key)
-            os.environ[key] = value
+            self._old_envvars[key] = self._overlay.get(key)
+            self._overlay[key] = value
 
     def __enter__(self):
         return self
@@ -24,21 +30,27 @@ class EnvAccessor:
     def __exit__(self, exc_type, exc_val, exc_tb):
         for key, value in self._old_envvars.items():
             if value is None:
-                os.environ.pop(key)
+                self._overlay.pop(key, None)
             else:
-                os.environ[key] = value
+                self._overlay[key] = value
 
     def __call__(self, **kwargs):
-        return EnvAccessor(**kwargs)
+        return EnvAccessor(self._overlay, **kwargs)
 
     def __getattr__(self, name):
-        return os.environ.get(name)
+        return self._overlay.get(name, os.environ.get(name))
 
     def __setattr__(self, name, value):
         if name.startswith("_"):
             super().__setattr__(name, value)
         else:
-            os.environ[name] = value
+            self._overlay[name] = value
+
+    def merged(self) -> Dict[str, str]:
+        """
+        Return os.environ combined with the variables set through this accessor.
+        """
+        return {**os.environ, **self._overlay}
 
 
 env = EnvAccessor()
@@ -2,6 +2,8 @@
 Parameter storage for parci.
 """
 
+import functools
+
 from parci import config
 
 
@@ -18,69 +20,75 @@ class ParameterStoreInterceptor:
     first use.
     """
 
-    def __init__(self):
-        self._ps = None
-
-    def _load_store(self):
+    @functools.cached_property
+    def _store(self):
         # pylint: disable=import-outside-toplevel
         if config.PARAMETER_DRIVER == "local":
             from .local import open_parameter_store
 
-            self._ps = open_parameter_store()
-        elif config.PARAMETER_DRIVER == "aws-ssm":
+            return open_parameter_store()
+        if config.PARAMETER_DRIVER == "aws-ssm":
             from .aws import SSMParameterStore
 
-            self._ps = SSMParameterStore()
-        else:
-            raise ValueError("config.PARAMETER_DRIVER is not a valid driver type")
+            return SSMParameterStore()
+        raise ValueError("config.PARAMETER_DRIVER is not a valid driver type")
+
+    @staticmethod
+    def _check_writable():
+        if config.PARAMETER_READ_ONLY:
+            raise ParameterStoreException("config.PARAMETER_READ_ONLY is set to true")
 
     def __contains__(self, item):
-        if self._ps is None:
-            self._load_store()
-        return self._ps.__contains__(item)
+        return item in self._store
 
     def __getitem__(self, item):
-        if self._ps is None:
-            self._load_store()
-        return self._ps.__getitem__(item)
+        return self._store[item]
 
     def __setitem__(self, key, value):
-        if config.PARAMETER_READ_ONLY:
-            raise ParameterStoreException("config.PARAMETER_READ_ONLY is set to true")
-        if self._ps is None:
-            self._load_store()
-        self._ps.__setitem__(key, value)
+        self._check_writable()
+        self._store[key] = value
 
     def __delitem__(self, key):
-        if config.PARAMETER_READ_ONLY:
-            raise ParameterStoreException("config.PARAMETER_READ_ONLY is set to true")
-        if self._ps is None:
-            self._load_store()
-        self._ps.__delitem__(key)
+        self._check_writable()
+        del self._store[key]
+
+    def prefetch(self, names):
+        """
+        Fetch several parameters at once ahead of lookups.
+
+        Does nothing for stores without round trips to save, e.g. the local store.
+        """
+        prefetch = getattr(self._store, "prefetch", None)
+        if prefetch is not None:
+            prefetch(names)
+
+    def prefix_prefetch(self):
+        """
+        Fetch every parameter ahead of lookups.
+
+        Does nothing for stores without round trips to save, e.g. the local store.
+        """
+        prefix_prefetch = getattr(self._store, "prefix_prefetch", None)
+        if prefix_prefetch is not None:
+            prefix_prefetch()
 
     def keys(self):
         """
         Return a list of keys in the parameter store.
         """
-        if self._ps is None:
-            self._load_store()
-        return self._ps.keys()
+        return self._store.keys()
 
     def items(self):
         """
         Return a list of items in the parameter store.
         """
-        if self._ps is None:
-            self._load_store()
-        return self._ps.items()
+        return self._store.items()
 
     def values(self):
         """
         Return a list of values in the parameter store.
         """
-        if self._ps is None:
-            self._load_store()
-        return self._ps.values()
+        return self._store.values()
 
 
 params = ParameterStoreInterceptor()
@@ -2,13 +2,16 @@
 AWS parameter storage interfaces.
 """
 
+import functools
 import json
 import os
-
+from typing import Any, Dict, Iterable
 
 import boto3
+import botocore.config
 
 from parci import config
+from parci.internals.utils import json_dumps, json_loads
 
 
 class SSMParameterStoreException(Exception):
@@ -26,36 +29,79 @@ class SSMParameterStore:
             "PARCI_PARAMETER_STORE_SSM_PREFIX", "/parci"
         ),
     ):
-        self.prefix = parameter_prefix
+        self.prefix = "/" + parameter_prefix.strip("/")
+
+        self._cache: Dict[str, Any] = {}
+
+    @functools.cached_property
+    def client(self):
+        """
+        The SSM client, created on first use and reused for every request.
+        """
+        return boto3.client(
+            "ssm",
+            config=botocore.config.Config(
+                max_pool_connections=16,
+                retries={"max_attempts": 5, "mode": "adaptive"},
+                tcp_keepalive=True,
+            ),
+        )
 
-        while self.prefix.endswith("/"):
-            self.prefix = self.prefix[:-1]
-        if not self.prefix.startswith("/"):
-            self.prefix = "/" + self.prefix
+    @staticmethod
+    def _decode_parameter(parameter):
+        if parameter["Type"] == "StringList":
+            return parameter["Value"].split(",")
+        try:
+            return json_loads(parameter["Value"])
+        except json.JSONDecodeError:
+            return parameter["Value"]
+
+    def _decode_parameters(self, parameters):
+        prefix = self.prefix + "/"
+        for parameter in parameters:
+            name = parameter["Name"]
+            if name.startswith(prefix):
+                name = name[len(prefix) :]
+            yield name, self._decode_parameter(parameter)
 
-        self.client = boto3.client("ssm")
+    def prefetch(self, names: Iterable[str]):
+        """
+        Fetch several parameters at once, ten per request, for later lookups.
+        """
+        names = [f"{self.prefix}/{name}" for name in names]
+        for i in range(0, len(names), 10):
+            response = self.client.get_parameters(
+                Names=names[i : i + 10], WithDecryption=True
+            )
+            self._cache.update(self._decode_parameters(response["Parameters"]))
+
+    def prefix_prefetch(self):
+        """
+        Fetch every parameter under the prefix for later lookups.
+        """
+        self._cache.update(self.items())
 
     def __getitem__(self, name):
+        if name in self._cache:
+            return self._cache[name]
         response = self.client.get_parameter(
             Name=f"{self.prefix}/{name}", WithDecryption=True
         )["Parameter"]
-        if response["Type"] == "StringList":
-            return response["Value"].split(",")
-        try:
-            return json.loads(response["Value"])
-        except json.JSONDecodeError:
-            return response["Value"]
+        return self._decode_parameter(response)
 
     def __setitem__(self, name, value):
         if config.PARAMETER_READ_ONLY:
             raise SSMParameterStoreException("Cannot write to AWS SSM parameter store")
 
         if not name.startswith("/"):
+            self._cache.pop(name, None)
             name = self.prefix + "/" + name
+        elif name.startswith(self.prefix + "/"):
+            self._cache.pop(name[len(self.prefix) + 1 :], None)
 
         self.client.put_parameter(
             Name=name,
-            Value=json.dumps(value),
+            Value=json_dumps(value).decode("utf-8"),
             Type="SecureString",
             Overwrite=True,
             Tier="Intelligent-Tiering",
@@ -77,3 +123,20 @@ class SSMParameterStore:
                 if name.startswith(prefix):
                     name = name[len(prefix) :]
                 yield name
+
+    def items(self):
+        """
+        Return (key, value) pairs for every parameter in the SSM parameter store.
+        """
+        paginator = self.client.get_paginator("get_parameters_by_path")
+        for page in paginator.paginate(
+            Path=self.prefix, Recursive=True, WithDecryption=True
+        ):
+            yield from self._decode_parameters(page["Parameters"])
+
+    def values(self):
+        """
+        Return the values of every parameter in the SSM parameter store.
+        """
+        for _, value in self.items():
+            yield value
@@ -14,9 +14,15 @@ from nacl import secret, pwhash, utils, hash as naclhash, encoding
 
 from parci.internals.storage import SqliteKV
 from parci import config
-from parci.internals.utils import encode_bytes, decode_bytes
+from parci.internals.utils import encode_bytes, decode_bytes, json_dumps, json_loads
 
-from .encrypt.password import get_user_decrypt_key, get_keys_by_password
+from .config_db import open_config_db
+from .encrypt.password import argon2_limits, get_user_decrypt_key, get_keys_by_password
+
+# Per-table schema version, recorded as a "schema:<table>" config row.
+# Version 1: ciphertexts are stored as raw BLOBs rather than base64 text.
+# Version 2: name hashes are stored as raw BLOBs rather than hex text.
+SCHEMA_VERSION = 2
 
 
 def init():
@@ -25,7 +31,7 @@ def init():
     """
     os.makedirs(os.path.dirname(config.PARAMETER_DB), mode=0o700, exist_ok=True)
 
-    config_db = SqliteKV(db=config.PARAMETER_DB, table="config")
+    config_db = open_config_db()
     if "password" in config_db:
         raise ValueError("Database already initialized")
 
@@ -37,8 +43,7 @@ def init():
 
     keysize = secret.SecretBox.KEY_SIZE
     salt = utils.random(pwhash.argon2id.SALTBYTES)
-    opslimit = pwhash.argon2id.OPSLIMIT_SENSITIVE
-    memlimit = pwhash.argon2id.MEMLIMIT_SENSITIVE
+    opslimit, memlimit = argon2_limits()
     key = get_user_decrypt_key(
         unicodedata.normalize("NFKC", password1).encode("utf-8"),
         salt,
@@ -85,7 +90,7 @@ def register_keyring():
     value_nonce = utils.random(secret.SecretBox.NONCE_SIZE)
     enc_value_key = box.encrypt(value_key, value_nonce)
 
-    config_db = SqliteKV(db=config.PARAMETER_DB, table="config")
+    config_db = open_config_db()
     config_db["keyring"] = {
         "name_key": encode_bytes(enc_name_key),
         "value_key": encode_bytes(enc_value_key),
@@ -95,14 +100,15 @@ def register_keyring():
     config_db["default-open-method"] = "keyring"
 
 
-def get_keys_by_keyring():
+def get_keys_by_keyring(config_db: Optional[SqliteKV] = None):
     """
     Retrieve encryption keys from the system keyring.
     """
     # pylint: disable=import-outside-toplevel
     import keyring
 
-    config_db = SqliteKV(db=config.PARAMETER_DB, table="config")
+    if config_db is None:
+        config_db = open_config_db()
     kr_config = config_db["keyring"]
     for key in ("name_key", "value_key"):
         kr_config[key] = decode_bytes(kr_config[key])
@@ -128,33 +134,70 @@ class ParameterStore:
     ):
         self.kv = SqliteKV(db=db, table=table, serialize_values=False)
         self._name_key = name_key
-        self._value_key = value_key
+        # The value key never changes, so build its SecretBox once.
+        self._box = secret.SecretBox(value_key)
+        self._key_cache = {}
+        self._migrate()
+
+    def _migrate(self):
+        config_kv = self.kv.for_table("config")
+        version_key = f"schema:{self.kv.table}"
+        if config_kv.get(version_key, 0) >= SCHEMA_VERSION:
+            return
+        with self.kv.batch():
+            # Check again now that we hold the write lock.
+            version = config_kv.get(version_key, 0)
+            if version < 1:
+                self.kv.batch_set(
+                    [(k, decode_bytes(v)) for k, v in self.kv.items() if isinstance(v, str)]
+                )
+            if version < 2:
+                rows = [(k, v) for k, v in self.kv.items() if isinstance(k, str)]
+                for k, _ in rows:
+                    del self.kv[k]
+                self.kv.batch_set([(bytes.fromhex(k), v) for k, v in rows])
+            config_kv[version_key] = SCHEMA_VERSION
 
     def _calc_key(self, item):
-        item = json.dumps(item).encode("utf-8")
+        # Only plain string names are memoized; other JSON values may be unhashable,
+        # and equal-hashing values like 1 and True serialize differently.
+        cacheable = isinstance(item, str)
+        if cacheable and item in self._key_cache:
+            return self._key_cache[item]
+
+        db_key = self._calc_key_from_bytes(self._encode_item(item))
+        if cacheable:
+            self._key_cache[item] = db_key
+        return db_key
+
+    @staticmethod
+    def _encode_item(item) -> bytes:
+        # Name hashes must not depend on whether orjson is installed, so this
+        # deliberately keeps the stdlib encoder.
+        return json.dumps(item).encode("utf-8")
+
+    def _calc_key_from_bytes(self, item_bytes: bytes) -> bytes:
         return naclhash.blake2b(
-            item, key=self._name_key, encoder=encoding.HexEncoder
-        ).decode("ascii")
+            item_bytes, key=self._name_key, encoder=encoding.RawEncoder
+        )
+
+    def _decrypt(self, value):
+        return json_loads(self._box.decrypt(value))
 
     def __getitem__(self, item):
         db_key = self._calc_key(item)
-        box = secret.SecretBox(self._value_key)
-        value = self.kv[db_key]
-        value = decode_bytes(value)
-        value = box.decrypt(value)
-        return json.loads(value)[1]
+        return self._decrypt(self.kv[db_key])[1]
 
     def __setitem__(self, item, value):
         if config.PARAMETER_READ_ONLY:
             raise KeyError("ParameterStore is read-only")
 
-        db_key = self._calc_key(item)
-        box = secret.SecretBox(self._value_key)
+        # Encode the item once, for both its name hash and the [item, value] payload.
+        item_bytes = self._encode_item(item)
+        db_key = self._calc_key_from_bytes(item_bytes)
         nonce = utils.random(secret.SecretBox.NONCE_SIZE)
-        value = json.dumps([item, value]).encode("utf-8")
-        value = box.encrypt(value, nonce)
-        value = encode_bytes(value)
-        self.kv[db_key] = value
+        value = b"[" + item_bytes + b"," + json_dumps(value) + b"]"
+        self.kv[db_key] = bytes(self._box.encrypt(value, nonce))
 
     def __delitem__(self, item):
         if config.PARAMETER_READ_ONLY:
@@ -171,12 +214,8 @@ class ParameterStore:
         """
         Return a list of (key, value) item pairs.
         """
-        box = secret.SecretBox(self._value_key)
-
         for value in self.kv.values():
-            value = decode_bytes(value)
-            value = box.decrypt(value)
-            k, v = json.loads(value)
+            k, v = self._decrypt(value)
             yield k, v
 
     def keys(self):
@@ -197,34 +236,38 @@ class ParameterStore:
         return self.keys()
 
 
+def _get_keys_by_password(config_db: SqliteKV):
+    return get_keys_by_password(config.PARAMETER_DB_PASSWORD, config_db=config_db)
+
+
+def _get_keys_by_yubikey(config_db: SqliteKV):
+    # pylint: disable=import-outside-toplevel
+    from .encrypt.yubikey import get_keys_by_yubikey
+
+    return get_keys_by_yubikey(config_db=config_db)
+
+
+# Key retrieval function for each encryption security method
+OPEN_METHODS = {
+    "password": _get_keys_by_password,
+    "yubikey": _get_keys_by_yubikey,
+    "keyring": get_keys_by_keyring,
+}
+
+
 def open_parameter_store(method: Optional[str] = None):
     """
     Convenience function for opening a local parameter store.
     """
-    config_db = SqliteKV(db=config.PARAMETER_DB, table="config")
+    config_db = open_config_db()
 
     if method is None:
         method = config_db["default-open-method"]
 
-    if method not in (
-        "password",
-        "yubikey",
-        "keyring",
-    ):
-        raise ValueError('invalid encryption security method')
-
-    if method == "password":
-        name_key, value_key = get_keys_by_password(
-            config.PARAMETER_DB_PASSWORD,
-        )
-    elif method == "yubikey":
-        # pylint: disable=import-outside-toplevel
-        from .encrypt.yubikey import get_keys_by_yubikey
-
-        name_key, value_key = get_keys_by_yubikey()
-    elif method == "keyring":
-        name_key, value_key = get_keys_by_keyring()
-    else:
-        raise ValueError('method must be "password", "yubikey", or "keyring"')
+    try:
+        get_keys = OPEN_METHODS[method]
+    except KeyError:
+        raise ValueError('method must be "password", "yubikey", or "keyring"') from None
 
-    return ParameterStore(config.PARAMETER_DB, name_key, value_key)
+    name_key, value_key = get_keys(config_db)
+    return ParameterStore(config_db.db, name_key, value_key)
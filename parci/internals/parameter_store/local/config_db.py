@@ -0,0 +1,20 @@
+"""
+Access to the local parameter database's config table.
+"""
+
+import functools
+
+from parci import config
+from parci.internals.storage import SqliteKV
+
+
+@functools.lru_cache(maxsize=None)
+def _open_config_db(path: str) -> SqliteKV:
+    return SqliteKV(db=path, table="config")
+
+
+def open_config_db() -> SqliteKV:
+    """
+    Return the config table of config.PARAMETER_DB, opening it on first use.
+    """
+    return _open_config_db(config.PARAMETER_DB)
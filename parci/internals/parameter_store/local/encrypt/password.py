@@ -4,7 +4,7 @@ Password-based storage encryption.
 
 import getpass
 import unicodedata
-from typing import Optional
+from typing import Optional, Tuple
 
 from nacl import secret, pwhash
 
@@ -12,6 +12,22 @@ from parci import config
 from parci.internals.utils import decode_bytes
 from parci.internals.storage import SqliteKV
 
+from ..config_db import open_config_db
+
+
+def argon2_limits() -> Tuple[int, int]:
+    """
+    Argon2id (opslimit, memlimit) to use when creating a new derived key.
+
+    Defaults to the libsodium SENSITIVE limits unless configured otherwise.
+    """
+    opslimit = config.PARAMETER_ARGON2_OPSLIMIT
+    memlimit = config.PARAMETER_ARGON2_MEMLIMIT
+    return (
+        pwhash.argon2id.OPSLIMIT_SENSITIVE if opslimit is None else int(opslimit),
+        pwhash.argon2id.MEMLIMIT_SENSITIVE if memlimit is None else int(memlimit),
+    )
+
 
 def get_user_decrypt_key(
     password: bytes,
@@ -28,11 +44,14 @@ def get_user_decrypt_key(
     )
 
 
-def get_keys_by_password(password: Optional[str] = None):
+def get_keys_by_password(
+    password: Optional[str] = None, config_db: Optional[SqliteKV] = None
+):
     """
     Retrieve encryption keys via the password provided.
     """
-    config_db = SqliteKV(db=config.PARAMETER_DB, table="config")
+    if config_db is None:
+        config_db = open_config_db()
     password_config = config_db["password"]
     for key in ("salt", "name_key", "value_key"):
         password_config[key] = decode_bytes(password_config[key])
@@ -2,17 +2,19 @@
 Yubikey-based storage encryption.
 """
 
+from typing import Optional
+
 import ykman.device
 from nacl import secret, pwhash, utils
 from ykman.base import YkmanDevice
 from yubikit.core.otp import OtpConnection
 from yubikit.yubiotp import SLOT, YubiOtpSession
 
-from parci import config
 from parci.internals.utils import encode_bytes, decode_bytes
 from parci.internals.storage import SqliteKV
 
-from .password import get_keys_by_password
+from ..config_db import open_config_db
+from .password import argon2_limits, get_keys_by_password
 
 
 def get_yubikey_decrypt_key(
@@ -48,8 +50,7 @@ def register_yubikey(slot: SLOT = SLOT(2)):
     challenge = utils.random(64)
     salt = utils.random(pwhash.argon2id.SALTBYTES)
     keysize = secret.SecretBox.KEY_SIZE
-    opslimit = pwhash.argon2id.OPSLIMIT_SENSITIVE
-    memlimit = pwhash.argon2id.MEMLIMIT_SENSITIVE
+    opslimit, memlimit = argon2_limits()
 
     key = get_yubikey_decrypt_key(
         device=device,
@@ -68,7 +69,7 @@ def register_yubikey(slot: SLOT = SLOT(2)):
     enc_name_key = box.encrypt(name_key, name_nonce)
     enc_value_key = box.encrypt(value_key, value_nonce)
 
-    config_db = SqliteKV(db=config.PARAMETER_DB, table="config")
+    config_db = open_config_db()
     # pylint: disable=duplicate-code
     config_db[f"yubikey:{serial}"] = {
         "slot": slot.value,
@@ -83,11 +84,12 @@ def register_yubikey(slot: SLOT = SLOT(2)):
     config_db["default-open-method"] = "yubikey"
 
 
-def get_keys_by_yubikey():
+def get_keys_by_yubikey(config_db: Optional[SqliteKV] = None):
     """
     Retrieve encryption keys from a registered Yubikey.
     """
-    config_db = SqliteKV(db=config.PARAMETER_DB, table="config")
+    if config_db is None:
+        config_db = open_config_db()
     device, info = ykman.device.list_all_devices()[0]
     serial = info.serial
     yk_config = config_db[f"yubikey:{serial}"]
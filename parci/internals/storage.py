@@ -2,25 +2,79 @@
 Lower level storage implementations.
 """
 
-import json
+import contextlib
+import copy
+import functools
 import sqlite3
 
+from parci.internals.utils import json_dumps, json_loads
+
+
+# pylint: disable-next=too-few-public-methods
+class _ConnectionState:
+    """
+    Per-connection setup and transaction state for SqliteKV.
+    """
+
+    initialized = False
+    batching = False
+
+
+# pylint: disable-next=too-few-public-methods
+class _SharedConnection(sqlite3.Connection, _ConnectionState):
+    """
+    A connection shared by every SqliteKV opened on the same database path.
+    """
+
+
+@functools.lru_cache(maxsize=None)
+def _open_conn(path: str) -> _SharedConnection:
+    return sqlite3.connect(path, check_same_thread=False, factory=_SharedConnection)
+
 
 class SqliteKV:
     """
     A key-value store that works like a dict and is backed by an SQLite database.
     """
 
+    GET_SQL = "SELECT value FROM tkv WHERE table_name = ? AND key = ?"
+    # The UNIQUE (table_name, key) ON CONFLICT REPLACE constraint makes this an upsert.
+    SET_SQL = "INSERT OR REPLACE INTO tkv VALUES (?, ?, ?)"
+    DELETE_SQL = "DELETE FROM tkv WHERE table_name = ? AND key = ?"
+    CONTAINS_SQL = "SELECT key FROM tkv WHERE table_name = ? AND key = ?"
+    KEYS_SQL = "SELECT key FROM tkv WHERE table_name = ?"
+    VALUES_SQL = "SELECT value FROM tkv WHERE table_name = ?"
+    ITEMS_SQL = "SELECT key, value FROM tkv WHERE table_name = ?"
+
     def __init__(self, db, table="params", serialize_values=True):
         if isinstance(db, sqlite3.Connection):
             self.db = db
         else:
-            self.db = sqlite3.connect(db)
+            self.db = _open_conn(db)
 
         self.table = table
         self.serialize_values = serialize_values
-        self.db.execute("PRAGMA foreign_keys=ON")
+        # Shared connections carry their own state, so that setup runs once and a
+        # batch() on one SqliteKV also holds back commits from the others.
+        if isinstance(self.db, _SharedConnection):
+            self._state = self.db
+        else:
+            self._state = _ConnectionState()
+        if not self._state.initialized:
+            self._initialize()
+
+    def _initialize(self):
         self.db.execute("PRAGMA journal_mode=WAL")
+        # WAL keeps the database consistent without an fsync on every commit.
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA temp_store=MEMORY")
+        self.db.execute("PRAGMA cache_size=-65536")
+        self.db.execute("PRAGMA mmap_size=268435456")
+        # Writes are small and rare compared to reads; checkpoint less often.
+        self.db.execute("PRAGMA wal_autocheckpoint=10000")
+        self.db.execute("PRAGMA busy_timeout=5000")
+        # The UNIQUE constraint's index leads with table_name, so it also serves the
+        # per-table keys()/values()/items() scans; no separate index is needed.
         self.db.execute(
             """
 CREATE TABLE IF NOT EXISTS tkv (
@@ -30,41 +84,72 @@ CREATE TABLE IF NOT EXISTS tkv (
 """
         )
         self.db.commit()
+        self._state.initialized = True
+
+    def for_table(self, table, serialize_values=True) -> "SqliteKV":
+        """
+        Another table of the same database, sharing this store's transactions.
+        """
+        kv = copy.copy(self)
+        kv.table = table
+        kv.serialize_values = serialize_values
+        return kv
+
+    def _commit(self):
+        if not self._state.batching:
+            self.db.commit()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Group writes made inside the with block into a single transaction.
+        """
+        if self._state.batching:
+            yield self
+            return
+
+        self.db.commit()
+        self.db.execute("BEGIN IMMEDIATE")
+        self._state.batching = True
+        try:
+            yield self
+        except BaseException:
+            self.db.rollback()
+            raise
+        else:
+            self.db.commit()
+        finally:
+            self._state.batching = False
 
     def __getitem__(self, item):
-        for (v,) in self.db.execute(
-            "SELECT value FROM tkv WHERE table_name = ? AND key = ?",
-            (
-                self.table,
-                item,
-            ),
-        ):
+        for (v,) in self.db.execute(self.GET_SQL, (self.table, item)):
             if self.serialize_values:
-                return json.loads(v)
+                return json_loads(v)
             return v
         raise KeyError("Key does not exist")
 
     def __setitem__(self, item, value):
         if self.serialize_values:
-            value = json.dumps(value)
-        self.db.execute(
-            "INSERT INTO tkv VALUES (?, ?, ?) ON CONFLICT DO UPDATE SET value = ?",
-            (self.table, item, value, value),
-        )
-        self.db.commit()
+            value = json_dumps(value).decode("utf-8")
+        self.db.execute(self.SET_SQL, (self.table, item, value))
+        self._commit()
         return value
 
+    def batch_set(self, items):
+        """
+        Set several (key, value) pairs with a single statement and commit.
+        """
+        if self.serialize_values:
+            items = ((k, json_dumps(v).decode("utf-8")) for k, v in items)
+        with self.batch():
+            self.db.executemany(self.SET_SQL, ((self.table, k, v) for k, v in items))
+
     def __delitem__(self, key):
-        self.db.execute(
-            "DELETE FROM tkv WHERE table_name = ? AND key = ?",
-            (self.table, key),
-        )
-        self.db.commit()
+        self.db.execute(self.DELETE_SQL, (self.table, key))
+        self._commit()
 
     def __contains__(self, item):
-        for _k in self.db.execute(
-            "SELECT key FROM tkv WHERE table_name = ? AND key = ?", (self.table, item)
-        ):
+        for _k in self.db.execute(self.CONTAINS_SQL, (self.table, item)):
             return True
         return False
 
@@ -81,22 +166,15 @@ CREATE TABLE IF NOT EXISTS tkv (
         """
         Return a list of all keys.
         """
-        return (
-            row[0]
-            for row in self.db.execute(
-                "SELECT key FROM tkv WHERE table_name = ?", (self.table,)
-            )
-        )
+        return (row[0] for row in self.db.execute(self.KEYS_SQL, (self.table,)))
 
     def values(self):
         """
         Return a list of values.
         """
-        for row in self.db.execute(
-            "SELECT value FROM tkv WHERE table_name = ?", (self.table,)
-        ):
+        for row in self.db.execute(self.VALUES_SQL, (self.table,)):
             if self.serialize_values:
-                yield json.loads(row[0])
+                yield json_loads(row[0])
             else:
                 yield row[0]
 
@@ -104,11 +182,9 @@ CREATE TABLE IF NOT EXISTS tkv (
         """
         Return an iterator over (key, value) pairs.
         """
-        for k, v in self.db.execute(
-            "SELECT key, value FROM tkv WHERE table_name = ?", (self.table,)
-        ):
+        for k, v in self.db.execute(self.ITEMS_SQL, (self.table,)):
             if self.serialize_values:
-                yield k, json.loads(v)
+                yield k, json_loads(v)
             else:
                 yield k, v
 
@@ -18,8 +18,13 @@ class Task:
     """
 
     def __init__(self, name: Optional[str] = None):
-        self._parents = set()
-        self._children = set()
+        # Dicts rather than sets so that iteration follows insertion order.
+        self._parents = {}
+        self._children = {}
+        self._parents_tuple = None
+        self._children_tuple = None
+        # Parents which have not yet run successfully.
+        self._unmet_parents = 0
         self.has_run = False
         self.succeeded = None
         if name is None:
@@ -37,14 +42,18 @@ class Task:
         """
         A list of the task's parents.
         """
-        return tuple(self._parents)
+        if self._parents_tuple is None:
+            self._parents_tuple = tuple(self._parents)
+        return self._parents_tuple
 
     @property
     def children(self):
         """
         A list of tasks's children.
         """
-        return tuple(self._children)
+        if self._children_tuple is None:
+            self._children_tuple = tuple(self._children)
+        return self._children_tuple
 
     def body(self):
         """
@@ -57,9 +66,13 @@ class Task:
         Run the task.
         """
         print(f"Running task: {prefix}{self.name}")
+        already_succeeded = self.succeeded
         try:
             self.body()
             self.succeeded = True
+            if not already_succeeded:
+                for child in self.children:
+                    child._unmet_parents -= 1
         except Exception:
             print(f"ERROR: Task failed: {prefix}{self.name}", file=sys.stderr)
             self.succeeded = False
@@ -67,12 +80,19 @@ class Task:
         finally:
             self.has_run = True
 
+    @property
+    def is_ready(self) -> bool:
+        """
+        Whether the task has yet to run and all of its parents have succeeded.
+        """
+        return not self.has_run and self._unmet_parents == 0
+
     @property
     def next_tasks(self):
         """
         A list of the next tasks in the DAG.
         """
-        return tuple(self._children)
+        return self.children
 
     def add_child_task(self, child: Self):
         """
@@ -80,7 +100,10 @@ class Task:
         """
         if not isinstance(child, Task):
             raise ValueError("Child must be a Task object")
-        self._children.add(child)
+        if child in self._children:
+            return
+        self._children[child] = None
+        self._children_tuple = None
         child.add_parent_task(self)
 
     def add_parent_task(self, parent: Self):
@@ -89,8 +112,12 @@ class Task:
         """
         if not isinstance(parent, Task):
             raise ValueError("Parent must be a Task object")
-
-        self._parents.add(parent)
+        if parent in self._parents:
+            return
+        self._parents[parent] = None
+        self._parents_tuple = None
+        if not parent.succeeded:
+            self._unmet_parents += 1
         parent.add_child_task(self)
 
     def __lshift__(self, other: Self):
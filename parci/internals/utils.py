@@ -3,11 +3,23 @@ Miscellaneous utility functions that don't obviously belong anywhere else.
 """
 
 import base64
+import collections
+import importlib.util
+import json
+import marshal
+import os
+import re
+import sys
 import types
 from typing import Iterable, Set
 
 from parci.internals.task import Task
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 def encode_bytes(b: bytes):
     """
@@ -23,18 +35,91 @@ def decode_bytes(s: str):
     return base64.b64decode(s)
 
 
-def load_taskfile(filename: str) -> types.ModuleType:
+def json_dumps(obj) -> bytes:
+    """
+    Serialize obj to UTF-8 JSON bytes.
+    """
+    # Always stdlib json: orjson writes NaN and infinities as null, and accepts
+    # types such as UUID, Enum and date keys that json refuses. Writes are rare.
+    return json.dumps(obj).encode("utf-8")
+
+
+# orjson reads integers beyond 64 bits as floats, so input with a run of 19 or
+# more digits is left to json.
+_LONG_DIGITS = re.compile(r"\d{19}")
+_LONG_DIGITS_BYTES = re.compile(rb"\d{19}")
+
+
+def json_loads(data):
+    """
+    Deserialize JSON from str or bytes, using orjson when it is installed.
+    """
+    if orjson is not None:
+        long_digits = _LONG_DIGITS if isinstance(data, str) else _LONG_DIGITS_BYTES
+        if not long_digits.search(data):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                # json also accepts NaN, Infinity and out-of-range floats.
+                pass
+    return json.loads(data)
+
+
+def load_taskfile(filename: str, stdin_name: str = "<stdin>") -> types.ModuleType:
     """
     Load a parci.taskfile and compile it.
+
+    A filename of "-" reads the taskfile from standard input, and stdin_name
+    stands in for its filename in tracebacks and output.
     """
+    if filename == "-":
+        source = sys.stdin.read()
+        return _exec_taskfile(compile(source, stdin_name, "exec"), stdin_name)
+
+    return _exec_taskfile(_compile_taskfile(filename, os.stat(filename)), filename)
+
+
+def _compile_taskfile(filename: str, stat: os.stat_result) -> types.CodeType:
+    # Compiled taskfiles are cached in __pycache__ like modules, using the same
+    # header layout as a timestamp-based .pyc: magic, flags, source mtime and size.
+    cache_path = importlib.util.cache_from_source(filename + ".py")
+    header = (
+        importlib.util.MAGIC_NUMBER
+        + (0).to_bytes(4, "little")
+        + (int(stat.st_mtime) & 0xFFFFFFFF).to_bytes(4, "little")
+        + (stat.st_size & 0xFFFFFFFF).to_bytes(4, "little")
+    )
+
+    try:
+        with open(cache_path, "rb") as fobj:
+            data = fobj.read()
+        if data[:16] == header:
+            return marshal.loads(data[16:])
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
     with open(filename, "r", encoding="utf-8") as fobj:
-        taskfile = types.ModuleType("taskfile")
-        taskfile.__file__ = filename
         compiled = compile(fobj.read(), filename, "exec")
-        # exec() is intentional here
-        # pylint: disable=exec-used
-        exec(compiled, taskfile.__dict__)  # nosec B102
-        return taskfile
+
+    if not sys.dont_write_bytecode:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}"
+            with open(tmp_path, "wb") as fobj:
+                fobj.write(header + marshal.dumps(compiled))
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+    return compiled
+
+
+def _exec_taskfile(compiled: types.CodeType, filename: str) -> types.ModuleType:
+    taskfile = types.ModuleType("taskfile")
+    taskfile.__file__ = filename
+    # exec() is intentional here
+    # pylint: disable=exec-used
+    exec(compiled, taskfile.__dict__)  # nosec B102
+    return taskfile
 
 
 def get_starting_tasks(taskfile: types.ModuleType) -> Iterable[Task]:
@@ -55,24 +140,17 @@ def find_tasks(taskset: Set[Task], recordset: Set[Task]):
     """
     Find all of the tasks in a task sequence.
     """
-    for task in taskset:
+    stack = collections.deque(taskset)
+    while stack:
+        task = stack.pop()
+        if task in recordset:  # Break cycles
+            continue
         recordset.add(task)
-        for child in task.children:
-            if child in recordset:  # Break cycles
-                continue
-            find_tasks({child}, recordset)
+        stack.extend(task.children)
 
 
 def ready_tasks(taskset: Set[Task]) -> Set[Task]:
     """
     Get a list of tasks which are ready to be run.
     """
-    ready = set()
-    for task in taskset:
-        if task.has_run:
-            continue
-
-        if all(parent.has_run and parent.succeeded for parent in task.parents):
-            ready.add(task)
-
-    return ready
+    return {task for task in taskset if task.is_ready}